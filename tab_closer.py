@@ -7,18 +7,24 @@ Simple, fast, and practical tab management
 import argparse
 import asyncio
 import datetime as dt
+import functools
+import json
 import logging
+import os
 import platform
-import shutil
 import sqlite3
 import sys
-import tempfile
-import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Tuple
 from urllib.parse import urlparse
 
-import requests
+import httpx
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # ─── Configuration ──────────────────────────────────────────────────────────
 class Config:
@@ -28,6 +34,7 @@ class Config:
         self.log_root = self.get_default_log_root()
         self.profile_dir = self.get_default_profile_dir()
         self.connection_timeout = 10
+        self.max_concurrency = 4
         self.dry_run = False
         self.verbose = False
         
@@ -49,6 +56,11 @@ class Config:
 # ─── Global constants ────────────────────────────────────────────────────────
 CHROME_EPOCH = dt.datetime(1601, 1, 1)
 TABLE_HEADERS = ("Date", "Title", "URL", "Domain", "Idle Days")
+SQLITE_MAX_PARAMS = 900
+SKIP_SCHEMES = frozenset({
+    "chrome", "chrome-extension", "chrome-untrusted", "devtools", "edge",
+    "about", "javascript", "view-source", "data",
+})
 
 # ─── Logging setup ──────────────────────────────────────────────────────────
 def setup_logging(verbose: bool = False) -> logging.Logger:
@@ -64,6 +76,11 @@ def setup_logging(verbose: bool = False) -> logging.Logger:
 def chrome_ts(microseconds: int) -> dt.datetime:
     return CHROME_EPOCH + dt.timedelta(microseconds=microseconds)
 
+def get_scheme(url: str) -> str:
+    scheme, sep, _ = url.partition(":")
+    return scheme.lower() if sep else ""
+
+@functools.lru_cache(maxsize=4096)
 def get_domain(url: str) -> str:
     try:
         return urlparse(url).netloc
@@ -76,16 +93,45 @@ class TabCloser:
         self.logger = setup_logging(config.verbose)
         self.history_path = config.profile_dir / "History"
         self.html_index = config.log_root / "closed_tabs_index.html"
+        self.data_log = config.log_root / "closed_tabs.jsonl"
+        self.legacy_index = config.log_root / "closed_tabs_index_legacy.html"
+        self.pending_rows: List[Dict] = []
+        # Keep-alive async client shared by all DevTools calls
+        self.client = httpx.AsyncClient(timeout=config.connection_timeout)
+        
+    async def close(self) -> None:
+        """Release the DevTools HTTP connection pool."""
+        await self.client.aclose()
         
     def ensure_directories(self) -> None:
         self.config.log_root.mkdir(parents=True, exist_ok=True)
         
-    def ensure_html_header(self) -> None:
-        """Create or verify index.html with proper header."""
-        if self.html_index.exists():
-            return
-            
-        self.ensure_directories()
+    def load_entries(self) -> List[Dict]:
+        """Read every closed tab entry from the JSONL data log."""
+        entries = []
+        if not self.data_log.exists():
+            return entries
+        
+        with self.data_log.open(encoding="utf-8") as fp:
+            for line in fp:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json_loads(line))
+                except ValueError:
+                    self.logger.warning(f"Skipping malformed entry in {self.data_log.name}")
+        return entries
+    
+    def render_index(self, entries: List[Dict]) -> str:
+        """Render the HTML index with all entries embedded as JSON."""
+        # Escaping '<' keeps titles like '</script>' from ending the data block
+        data = json.dumps(entries, ensure_ascii=False, separators=(",", ":")).replace("<", "\\u003c")
+        hdr = "".join(f"<th>{h}</th>" for h in TABLE_HEADERS)
+        legacy = ""
+        archived = sorted(self.config.log_root.glob(f"{self.legacy_index.stem}*.html"))
+        if archived:
+            links = ", ".join(f"<a href='{p.name}'>{p.name}</a>" for p in archived)
+            legacy = f"<p>Earlier closed tab indexes: {links}</p>"
         
         html_content = """<!doctype html>
 <html>
@@ -107,83 +153,189 @@ class TabCloser:
         .idle-days { text-align: center; font-weight: bold; }
         .search-box { margin: 10px 0; padding: 8px; width: 300px; border: 1px solid #ddd; border-radius: 4px; }
     </style>
-    <script>
-        function searchTable() {
-            const input = document.getElementById('searchInput');
-            const filter = input.value.toLowerCase();
-            const table = document.querySelector('table');
-            const rows = table.getElementsByTagName('tr');
-            
-            for (let i = 1; i < rows.length; i++) {
-                const row = rows[i];
-                const text = row.textContent.toLowerCase();
-                row.style.display = text.includes(filter) ? '' : 'none';
-            }
-        }
-    </script>
 </head>
 <body>
     <h1>📑 Closed Tabs Log</h1>
     <div class="stats" id="stats">Loading statistics...</div>
-    <input type="text" id="searchInput" class="search-box" placeholder="Search closed tabs..." onkeyup="searchTable()">
+    __LEGACY__
+    <input type="text" id="searchInput" class="search-box" placeholder="Search closed tabs..." oninput="searchTable()">
     <table>
+        <thead><tr>__HEADER__</tr></thead>
+        <tbody id="rows"></tbody>
+    </table>
+    <script type="application/json" id="tabData">__DATA__</script>
+    <script>
+        // Rows are rendered in pages as the user scrolls; search runs over
+        // lowercased strings built once instead of walking the DOM.
+        const PAGE_SIZE = 200;
+        const entries = JSON.parse(document.getElementById('tabData').textContent).reverse().map(e => ({
+            e: e,
+            lc: [e.title, e.url, e.domain].join(' ').toLowerCase()
+        }));
+        const tbody = document.getElementById('rows');
+        const stats = document.getElementById('stats');
+        const domainCount = new Set(entries.map(x => x.e.domain)).size;
+        let matches = entries;
+        let shown = 0;
+        let pending = 0;
+
+        function cell(row, text, className) {
+            const td = row.insertCell();
+            if (className) td.className = className;
+            td.textContent = text;
+            return td;
+        }
+
+        function buildRow(e) {
+            const row = document.createElement('tr');
+            cell(row, e.closed_at);
+            const title = document.createElement('strong');
+            title.textContent = e.title;
+            row.insertCell().appendChild(title);
+            const link = document.createElement('a');
+            link.href = e.url;
+            link.target = '_blank';
+            link.className = 'url';
+            link.textContent = e.url.length > 100 ? e.url.slice(0, 100) + '...' : e.url;
+            row.insertCell().appendChild(link);
+            const domain = document.createElement('span');
+            domain.className = 'domain';
+            domain.textContent = e.domain;
+            row.insertCell().appendChild(domain);
+            cell(row, e.idle_days, 'idle-days');
+            return row;
+        }
+
+        function renderMore() {
+            const end = Math.min(shown + PAGE_SIZE, matches.length);
+            const frag = document.createDocumentFragment();
+            for (let i = shown; i < end; i++) frag.appendChild(buildRow(matches[i].e));
+            tbody.appendChild(frag);
+            shown = end;
+        }
+
+        function render() {
+            tbody.textContent = '';
+            shown = 0;
+            renderMore();
+            stats.textContent = `${entries.length} closed tabs from ${domainCount} domains` +
+                (matches.length === entries.length ? '' : ` · ${matches.length} matching`);
+        }
+
+        function searchTable() {
+            cancelAnimationFrame(pending);
+            pending = requestAnimationFrame(() => {
+                const filter = document.getElementById('searchInput').value.toLowerCase();
+                matches = filter ? entries.filter(x => x.lc.indexOf(filter) !== -1) : entries;
+                render();
+            });
+        }
+
+        window.addEventListener('scroll', () => {
+            if (shown < matches.length && window.innerHeight + window.scrollY >= document.body.offsetHeight - 600) {
+                renderMore();
+            }
+        });
+
+        render();
+    </script>
+</body>
+</html>
 """
-        
-        self.html_index.write_text(html_content, encoding="utf-8")
-        
-        hdr = "".join(f"<th>{h}</th>" for h in TABLE_HEADERS)
-        with self.html_index.open("a", encoding="utf-8") as fp:
-            fp.write(f"<tr>{hdr}</tr>\n")
+        return html_content.replace("__LEGACY__", legacy).replace("__HEADER__", hdr).replace("__DATA__", data)
     
-    def log_closed_tab_html(self, title: str, url: str, last_visit: dt.datetime, closed_at: dt.datetime) -> None:
-        """Log a closed tab to the HTML index."""
-        self.ensure_html_header()
+    def log_closed_tab(self, title: str, url: str, last_visit: dt.datetime, closed_at: dt.datetime) -> None:
+        """Queue a closed tab entry for the index."""
+        self.pending_rows.append({
+            "closed_at": f"{closed_at:%Y-%m-%d %H:%M}",
+            "title": title,
+            "url": url,
+            "domain": get_domain(url),
+            "idle_days": (closed_at - last_visit).days,
+        })
+    
+    def flush_index(self) -> None:
+        """Append queued entries to the data log and rebuild the HTML index."""
+        if not self.pending_rows:
+            return
         
-        domain = get_domain(url)
-        idle_days = (closed_at - last_visit).days
+        self.ensure_directories()
+        if self.html_index.exists() and not self.data_log.exists():
+            # Keep tabs logged by the existing index reachable, without ever
+            # overwriting an index archived by an earlier run
+            legacy_index = self.legacy_index
+            if legacy_index.exists():
+                legacy_index = legacy_index.with_name(
+                    f"{legacy_index.stem}_{dt.datetime.now():%Y%m%d_%H%M%S}.html"
+                )
+            self.html_index.replace(legacy_index)
+            self.logger.info(f"Previous index moved to {legacy_index}")
+        
+        # An interrupted earlier append can leave a partial last line; start
+        # on a fresh line so the first new entry is not merged into it
+        needs_newline = False
+        if self.data_log.exists() and self.data_log.stat().st_size > 0:
+            with self.data_log.open("rb") as fp:
+                fp.seek(-1, os.SEEK_END)
+                needs_newline = fp.read(1) != b"\n"
         
-        row = (
-            f"<tr>"
-            f"<td>{closed_at:%Y-%m-%d %H:%M}</td>"
-            f"<td><strong>{title}</strong></td>"
-            f"<td><a href='{url}' target='_blank' class='url'>{url[:100]}{'...' if len(url) > 100 else ''}</a></td>"
-            f"<td><span class='domain'>{domain}</span></td>"
-            f"<td class='idle-days'>{idle_days}</td>"
-            f"</tr>\n"
-        )
+        with self.data_log.open("a", encoding="utf-8") as fp:
+            if needs_newline:
+                self.logger.warning(f"Repairing truncated last entry in {self.data_log.name}")
+                fp.write("\n")
+            fp.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.pending_rows)
+        self.pending_rows.clear()
         
-        with self.html_index.open("a", encoding="utf-8") as fp:
-            fp.write(row)
+        # Write to a temp file and swap it in so an interrupted run never
+        # leaves a truncated index behind
+        tmp_index = self.html_index.with_suffix(".html.tmp")
+        try:
+            tmp_index.write_text(self.render_index(self.load_entries()), encoding="utf-8")
+            os.replace(tmp_index, self.html_index)
+        except BaseException:
+            tmp_index.unlink(missing_ok=True)
+            raise
     
     async def get_open_tabs(self) -> List[Dict]:
         """Retrieve list of open tabs from Chrome DevTools."""
         try:
-            response = requests.get(
-                f"http://localhost:{self.config.debug_port}/json",
-                timeout=self.config.connection_timeout
-            )
+            response = await self.client.get(f"http://localhost:{self.config.debug_port}/json")
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            return json_loads(response.content)
+        except (httpx.HTTPError, ValueError) as e:
             self.logger.error(f"Failed to connect to Chrome DevTools: {e}")
             self.logger.info(f"Make sure Chrome is running with --remote-debugging-port={self.config.debug_port}")
             return []
     
-    def get_tab_history(self, url: str, tmp_history: Path) -> Optional[dt.datetime]:
-        """Get last visit time for a URL from Chrome history."""
+    def get_history_map(self, urls: List[str]) -> Dict[str, dt.datetime]:
+        """Get last visit times for many URLs from Chrome history in one pass."""
+        history: Dict[str, dt.datetime] = {}
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return history
+        
         try:
-            db = sqlite3.connect(tmp_history)
-            cur = db.cursor()
-            cur.execute("SELECT last_visit_time FROM urls WHERE url=? LIMIT 1", (url,))
-            row = cur.fetchone()
-            db.close()
-            
-            if row:
-                return chrome_ts(row[0])
-            return None
+            # Read Chrome's live database in place; immutable skips locking so
+            # Chrome holding the file open does not block us
+            db = sqlite3.connect(f"{self.history_path.resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+            try:
+                cur = db.cursor()
+                # Stay below SQLite's default host-parameter limit
+                for start in range(0, len(unique_urls), SQLITE_MAX_PARAMS):
+                    batch = unique_urls[start:start + SQLITE_MAX_PARAMS]
+                    placeholders = ",".join("?" * len(batch))
+                    cur.execute(
+                        f"SELECT url, last_visit_time FROM urls WHERE url IN ({placeholders})",
+                        batch
+                    )
+                    for url, last_visit_time in cur.fetchall():
+                        history[url] = chrome_ts(last_visit_time)
+            finally:
+                db.close()
         except sqlite3.Error as e:
-            self.logger.warning(f"Database error for {url}: {e}")
-            return None
+            self.logger.error(f"Failed to read history database: {e}")
+        
+        return history
     
     async def close_tab(self, tab: Dict) -> bool:
         """Close a single tab."""
@@ -194,7 +346,7 @@ class TabCloser:
         
         try:
             close_url = f"http://localhost:{self.config.debug_port}/json/close/{tab_id}"
-            response = requests.post(close_url, timeout=self.config.connection_timeout)
+            response = await self.client.post(close_url)
             
             if response.status_code == 200:
                 return True
@@ -206,6 +358,21 @@ class TabCloser:
             self.logger.error(f"Error closing tab: {e}")
             return False
     
+    async def close_idle_tab(self, tab: Dict, last_visit: dt.datetime, closed_at: dt.datetime,
+                             semaphore: asyncio.Semaphore) -> bool:
+        """Close an idle tab and log it, limited by the shared semaphore."""
+        title = tab.get("title", "untitled")
+        
+        async with semaphore:
+            success = await self.close_tab(tab)
+            if success:
+                self.log_closed_tab(title, tab["url"], last_visit, closed_at)
+                self.logger.info(f"✓ Closed: {title}")
+            else:
+                self.logger.error(f"✗ Failed to close: {title}")
+        
+        return success
+    
     async def process_tabs(self) -> Tuple[int, int]:
         """Main processing logic. Returns (closed, total) counts."""
         if not self.history_path.exists():
@@ -225,28 +392,29 @@ class TabCloser:
         page_tabs = [tab for tab in tabs if tab.get("type") == "page"]
         self.logger.info(f"Found {len(page_tabs)} open tabs")
         
-        # Copy history database
-        tmp_history = Path(tempfile.gettempdir()) / f"history_tmp_{int(time.time())}"
-        try:
-            shutil.copy2(self.history_path, tmp_history)
-        except Exception as e:
-            self.logger.error(f"Failed to copy history database: {e}")
-            return 0, len(page_tabs)
-        
         processed = 0
         
         try:
+            candidate_tabs = []
             for tab in page_tabs:
                 url = tab.get("url", "")
-                title = tab.get("title", "untitled")
                 
-                # Skip browser internal pages
-                if not url or url.startswith(("chrome://", "chrome-extension://", "edge://", "about:")):
-                    self.logger.debug(f"Skipping internal page: {title}")
+                # Skip browser internal and local pages
+                if not url or get_scheme(url) in SKIP_SCHEMES:
+                    self.logger.debug(f"Skipping internal page: {tab.get('title', 'untitled')}")
                     continue
+                candidate_tabs.append(tab)
+            
+            # Look up every candidate URL in a single history query
+            history = self.get_history_map([tab["url"] for tab in candidate_tabs])
+            
+            idle_tabs = []
+            for tab in candidate_tabs:
+                url = tab["url"]
+                title = tab.get("title", "untitled")
                 
                 # Check last visit time
-                last_visit = self.get_tab_history(url, tmp_history)
+                last_visit = history.get(url)
                 if not last_visit:
                     self.logger.debug(f"No history found for: {title}")
                     continue
@@ -265,25 +433,24 @@ class TabCloser:
                 self.logger.debug(f"  Last visit: {last_visit:%Y-%m-%d %H:%M}")
                 self.logger.debug(f"  Idle for: {idle_days} days")
                 
-                if self.config.dry_run:
-                    processed += 1
-                    continue
-                
-                # Close the tab
-                success = await self.close_tab(tab)
-                if success:
-                    if not self.config.dry_run:
-                        self.log_closed_tab_html(title, url, last_visit, now)
-                    processed += 1
-                    self.logger.info(f"✓ Closed successfully")
-                else:
-                    self.logger.error(f"✗ Failed to close")
-                
-                # Small delay to avoid overwhelming Chrome
-                await asyncio.sleep(0.1)
+                idle_tabs.append((tab, last_visit))
+            
+            if self.config.dry_run:
+                processed = len(idle_tabs)
+            elif idle_tabs:
+                # Close tabs concurrently, bounded to keep Chrome responsive
+                semaphore = asyncio.Semaphore(self.config.max_concurrency)
+                results = await asyncio.gather(
+                    *(self.close_idle_tab(tab, last_visit, now, semaphore) for tab, last_visit in idle_tabs),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        self.logger.error(f"Error closing tab: {result}")
+                processed = sum(1 for result in results if result is True)
         
         finally:
-            tmp_history.unlink(missing_ok=True)
+            self.flush_index()
         
         return processed, len(page_tabs)
 
@@ -298,6 +465,8 @@ def parse_args():
                        help="Directory for log files")
     parser.add_argument("--profile", type=Path,
                        help="Chrome profile directory")
+    parser.add_argument("--concurrency", "-c", type=int, default=4,
+                       help="Maximum number of tabs to close at once (default: 4)")
     parser.add_argument("--dry-run", "-n", action="store_true",
                        help="Show what would be closed without actually doing it")
     parser.add_argument("--verbose", "-v", action="store_true",
@@ -312,6 +481,7 @@ async def main():
     config = Config()
     config.days_idle = args.days
     config.debug_port = args.port
+    config.max_concurrency = max(1, args.concurrency)
     config.dry_run = args.dry_run
     config.verbose = args.verbose
     
@@ -329,6 +499,7 @@ async def main():
     closer.logger.info(f"  Debug port: {config.debug_port}")
     closer.logger.info(f"  Log directory: {config.log_root}")
     closer.logger.info(f"  Profile directory: {config.profile_dir}")
+    closer.logger.info(f"  Concurrency: {config.max_concurrency}")
     closer.logger.info(f"  Dry run: {config.dry_run}")
     
     try:
@@ -350,6 +521,8 @@ async def main():
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        await closer.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file